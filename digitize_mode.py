@@ -4,14 +4,65 @@ Handles transitions to and from digitize mode, point collection,
 and polyline creation.
 """
 
+import logging
+import math
 import numpy as np
 import pyvista as pv
+import time
+import traceback
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray
+from vtkmodules.vtkFiltersCore import vtkGlyph3D
+from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+
+logger = logging.getLogger(__name__)
+
+
+class PointBuffer:
+    """Growable float64 array of 3D points - amortized O(1) append, zero-copy view"""
+    def __init__(self, capacity=64):
+        self.points = np.empty((capacity, 3))
+        self.n_points = 0
+    
+    def __len__(self):
+        return self.n_points
+    
+    def append(self, point):
+        """Append one point, doubling the capacity when full"""
+        if self.n_points == len(self.points):
+            grown = np.empty((2 * len(self.points), 3))
+            grown[:self.n_points] = self.points[:self.n_points]
+            self.points = grown
+        self.points[self.n_points] = point
+        self.n_points += 1
+    
+    def view(self):
+        """Points collected so far as an (n, 3) view into the buffer"""
+        return self.points[:self.n_points]
+    
+    def clear(self):
+        """Drop all points but keep the allocated capacity"""
+        self.n_points = 0
 
 
 class DigitizeMode:
+    # Picks closer than this in time and space are treated as one (about one frame)
+    PICK_DEBOUNCE_SECONDS = 0.016
+    PICK_DUPLICATE_FRACTION = 1e-4  # Fraction of mesh size
+    
     def __init__(self, visualizer):
         """Initialize digitize mode with reference to main visualizer"""
         self.viz = visualizer
+        self.marker_points = None  # Picked point positions feeding the marker glyphs
+        self.marker_glyph = None  # Sphere glyph filter, built once per polyline
+        self.marker_sphere = pv.Sphere(radius=1.0, theta_resolution=16, phi_resolution=16)  # Unit sphere tessellated once, scaled by the glyph filter
+        self.actors = []  # Actors added for the current polyline, removed by handle
+        self.line_polydata = None  # Current polyline geometry, updated in place per pick
+        self.line_conn = None  # Preallocated segment connectivity, grown by doubling
+        self.last_pick_time = 0.0
+        self.last_pick_point = None
+        self.interacting = False  # True between the interactor style's Start/EndInteractionEvent
+        self.visualization_pending = False  # Points picked mid-interaction, not yet drawn
         
     def activate(self):
         """Activate digitize mode - blue background, crosshair cursor"""
@@ -29,7 +80,7 @@ class DigitizeMode:
     def update_display(self):
         """Update display for digitize mode with blue background and crosshair cursor"""
         try:
-            if not hasattr(self.viz, 'plotter') or self.viz.plotter is None:
+            if self.viz.plotter is None:
                 print("Error: Plotter not initialized")
                 return
             
@@ -38,238 +89,117 @@ class DigitizeMode:
             
             # Set crosshair cursor for precise digitization
             cursor_msg = ""
-            if self.set_cursor_style(2):  # Crosshair cursor
+            if self.viz.set_cursor(2):  # Crosshair cursor
                 cursor_msg = " (crosshair cursor)"
             
             print(f"DIGITIZE MODE: Left click on mesh to add points to new polyline{cursor_msg}")
             
-            # Force camera update to ensure background color changes
-            self.force_camera_update()
-            
-        except Exception as e:
-            print(f"Error updating digitize mode display: {e}")
-            import traceback
-            traceback.print_exc()
-    
-    def force_camera_update(self):
-        """Force a tiny camera rotation to trigger background update"""
-        try:
-            camera = self.viz.plotter.camera
-            if camera is not None:
-                original_azimuth = camera.azimuth
-                camera.azimuth = original_azimuth + 0.01
-                self.viz.plotter.render()
-                camera.azimuth = original_azimuth
-                self.viz.plotter.render()
-        except Exception as camera_e:
-            print(f"Camera update failed (non-critical): {camera_e}")
-            # Just render without camera manipulation
+            # Render once so the background color change shows up
             self.viz.plotter.render()
-    
-    def set_cursor_style(self, cursor_type):
-        """Set cursor style using VTK interactor - with VTK constants and detailed debugging"""
-        try:
-            print(f"DEBUG: Attempting to set cursor to type {cursor_type}")
-            
-            # VTK cursor constants (these are the actual VTK values)
-            VTK_CURSOR_DEFAULT = 0
-            VTK_CURSOR_ARROW = 1
-            VTK_CURSOR_SIZENE = 2
-            VTK_CURSOR_SIZENW = 3
-            VTK_CURSOR_SIZESW = 4
-            VTK_CURSOR_SIZESE = 5
-            VTK_CURSOR_SIZENS = 6
-            VTK_CURSOR_SIZEWE = 7
-            VTK_CURSOR_SIZEALL = 8
-            VTK_CURSOR_HAND = 9
-            VTK_CURSOR_CROSSHAIR = 10
-            
-            # Map our simple codes to VTK constants
-            cursor_map = {
-                0: VTK_CURSOR_ARROW,      # Arrow
-                1: VTK_CURSOR_HAND,       # Hand  
-                2: VTK_CURSOR_CROSSHAIR   # Crosshair
-            }
-            
-            vtk_cursor_type = cursor_map.get(cursor_type, VTK_CURSOR_ARROW)
-            print(f"DEBUG: Mapped cursor {cursor_type} to VTK constant {vtk_cursor_type}")
-            
-            # Check what VTK components are available
-            print(f"DEBUG: Has iren: {hasattr(self.viz.plotter, 'iren')}")
-            print(f"DEBUG: Has render_window: {hasattr(self.viz.plotter, 'render_window')}")
-            print(f"DEBUG: Has window: {hasattr(self.viz.plotter, 'window')}")
-            
-            # Method 1: Direct VTK render window interactor
-            if hasattr(self.viz.plotter, 'iren') and self.viz.plotter.iren is not None:
-                interactor = self.viz.plotter.iren
-                print(f"DEBUG: Got interactor type: {type(interactor)}")
-                print(f"DEBUG: Interactor class name: {interactor.__class__.__name__}")
-                
-                # List all available methods on interactor
-                cursor_related_methods = [m for m in dir(interactor) if 'cursor' in m.lower()]
-                print(f"DEBUG: Available cursor-related methods on interactor: {cursor_related_methods}")
-                
-                # Try different VTK cursor methods with correct constants
-                cursor_methods = [
-                    ('SetCurrentCursorShape', vtk_cursor_type),
-                    ('SetCursorShape', vtk_cursor_type), 
-                    ('SetCurrentCursor', vtk_cursor_type),
-                    ('SetCursor', vtk_cursor_type)
-                ]
-                
-                for method_name, cursor_value in cursor_methods:
-                    if hasattr(interactor, method_name):
-                        print(f"DEBUG: Found method {method_name} on interactor")
-                        try:
-                            method = getattr(interactor, method_name)
-                            method(cursor_value)
-                            print(f"DEBUG: Successfully called {method_name}({cursor_value})")
-                            self.viz.plotter.render()
-                            return True
-                        except Exception as e:
-                            print(f"DEBUG: {method_name} failed: {e}")
-                    else:
-                        print(f"DEBUG: Method {method_name} NOT found on interactor")
-                
-                # Try through the render window from interactor
-                if hasattr(interactor, 'GetRenderWindow'):
-                    render_window = interactor.GetRenderWindow()
-                    print(f"DEBUG: Got render window from interactor: {type(render_window)}")
-                    
-                    if render_window:
-                        # List cursor methods on render window
-                        rw_cursor_methods = [m for m in dir(render_window) if 'cursor' in m.lower()]
-                        print(f"DEBUG: Cursor methods on render_window: {rw_cursor_methods}")
-                        
-                        cursor_rw_methods = [
-                            ('SetCurrentCursor', vtk_cursor_type),
-                            ('SetCursor', vtk_cursor_type),
-                            ('SetDesiredUpdateRate', None)  # Sometimes needed to refresh
-                        ]
-                        
-                        for method_name, cursor_value in cursor_rw_methods:
-                            if method_name == 'SetDesiredUpdateRate':
-                                continue
-                            if hasattr(render_window, method_name):
-                                print(f"DEBUG: Trying render_window.{method_name}")
-                                try:
-                                    method = getattr(render_window, method_name)
-                                    method(cursor_value)
-                                    render_window.Render()  # Force render on window
-                                    print(f"DEBUG: Successfully called render_window.{method_name}")
-                                    return True
-                                except Exception as e:
-                                    print(f"DEBUG: render_window.{method_name} failed: {e}")
-            
-            # Method 2: Through plotter's render_window directly
-            if hasattr(self.viz.plotter, 'render_window') and self.viz.plotter.render_window:
-                print("DEBUG: Trying through plotter.render_window directly")
-                render_window = self.viz.plotter.render_window
-                print(f"DEBUG: Direct render_window type: {type(render_window)}")
-                
-                # Check for VTK render window
-                if hasattr(render_window, '__class__'):
-                    print(f"DEBUG: Render window class: {render_window.__class__.__name__}")
-                
-                cursor_rw_methods = [
-                    ('SetCurrentCursor', vtk_cursor_type),
-                    ('SetCursor', vtk_cursor_type)
-                ]
-                
-                for method_name, cursor_value in cursor_rw_methods:
-                    if hasattr(render_window, method_name):
-                        print(f"DEBUG: Found {method_name} on direct render_window")
-                        try:
-                            method = getattr(render_window, method_name)
-                            method(cursor_value)
-                            render_window.Render()
-                            print(f"DEBUG: Successfully set cursor via direct render_window")
-                            return True
-                        except Exception as e:
-                            print(f"DEBUG: Direct render_window.{method_name} failed: {e}")
-            
-            # Method 3: Try through plotter.window (sometimes different from render_window)
-            if hasattr(self.viz.plotter, 'window'):
-                print("DEBUG: Trying through plotter.window")
-                window = self.viz.plotter.window
-                if window and hasattr(window, 'SetCurrentCursor'):
-                    try:
-                        window.SetCurrentCursor(vtk_cursor_type)
-                        print("DEBUG: Set cursor through plotter.window")
-                        return True
-                    except Exception as e:
-                        print(f"DEBUG: plotter.window cursor setting failed: {e}")
-            
-            print("DEBUG: WARNING - No cursor methods worked. Cursor will remain default.")
-            print("DEBUG: This might be a platform/backend limitation")
-            return False
             
         except Exception as e:
-            print(f"DEBUG: Cursor setting completely failed with exception: {e}")
-            import traceback
+            print(f"Error updating digitize mode display: {e}")
             traceback.print_exc()
-            return False
     
     def handle_pick(self, surface_point):
         """Handle surface picking in digitize mode - add point to current polyline"""
+        # Drop repeated picks of the same spot within one frame (double-click, trackpad noise)
+        pick_time = time.monotonic()
+        if (self.last_pick_point is not None and
+                pick_time - self.last_pick_time < self.PICK_DEBOUNCE_SECONDS and
+                math.dist(surface_point, self.last_pick_point) <
+                self.PICK_DUPLICATE_FRACTION * self.viz.mesh_size):
+            return
+        self.last_pick_time = pick_time
+        self.last_pick_point = surface_point
+        
         self.add_point_to_current_polyline(surface_point)
     
     def add_point_to_current_polyline(self, surface_point):
         """Add a surface point to the current polyline being digitized"""
-        try:
-            self.viz.current_polyline.append(surface_point)
-            print(f"Added point {len(self.viz.current_polyline)}: {surface_point}")
-            
-            # Visualize the picked point
-            self.add_point_visualization(surface_point, len(self.viz.current_polyline) - 1)
-            
-            # Update the current polyline visualization
-            self.update_current_polyline_visualization()
-            
-        except Exception as e:
-            print(f"Error adding point to polyline: {e}")
-    
-    def add_point_visualization(self, point, point_index):
-        """Add a visual marker for a picked point with smaller size"""
-        # Calculate appropriate sphere size based on mesh bounds (reduced by factor of 3)
-        mesh_size = np.linalg.norm(np.array(self.viz.mesh.bounds[1::2]) - np.array(self.viz.mesh.bounds[::2]))
-        sphere_radius = mesh_size * 0.0017  # ~0.17% of mesh size (reduced from 0.5%)
+        self.viz.current_polyline.append(surface_point)
+        logger.debug("Added point %d: %s", len(self.viz.current_polyline), surface_point)
         
-        sphere = pv.Sphere(radius=sphere_radius, center=point)
-        point_name = f'current_point_{point_index}'
+        # While the camera is being dragged, defer the visual update to mouse-up
+        if self.interacting:
+            self.visualization_pending = True
+            return
+        self.flush_point_visualization()
+    
+    def flush_point_visualization(self):
+        """Bring markers and line up to date with the collected points and render once"""
+        n_shown = 0 if self.marker_points is None else self.marker_points.GetNumberOfPoints()
+        for point in self.viz.current_polyline.view()[n_shown:]:
+            self.add_point_visualization(point)
         
-        # Add the point marker with bright color
-        self.viz.plotter.add_mesh(sphere, color='yellow', name=point_name)
+        self.update_current_polyline_visualization()
+        self.viz.plotter.render()
+        self.visualization_pending = False
+    
+    def on_start_interaction(self, obj, event):
+        """Interactor style observer - camera interaction started"""
+        self.interacting = True
+    
+    def on_end_interaction(self, obj, event):
+        """Interactor style observer - draw any points picked during the interaction"""
+        self.interacting = False
+        if self.visualization_pending:
+            self.flush_point_visualization()
+    
+    def add_point_visualization(self, point):
+        """Add a visual marker for a picked point with smaller size"""
+        if self.marker_glyph is None:
+            # All markers of the current polyline share one glyph actor
+            sphere_radius = self.viz.mesh_size * 0.0017  # ~0.17% of mesh size (reduced from 0.5%)
+            self.marker_points = vtkPoints()
+            self.marker_points.InsertNextPoint(point)
+            marker_centers = pv.PolyData()
+            marker_centers.SetPoints(self.marker_points)
+            
+            self.marker_glyph = vtkGlyph3D()
+            self.marker_glyph.SetSourceData(self.marker_sphere)
+            self.marker_glyph.SetInputData(marker_centers)
+            self.marker_glyph.SetScaleModeToDataScalingOff()
+            self.marker_glyph.SetScaleFactor(sphere_radius)
+            
+            # Add the point markers with bright color
+            self.actors.append(self.viz.plotter.add_mesh(self.marker_glyph, color='yellow', name='current_points',
+                                                         render=False))
+        else:
+            self.marker_points.InsertNextPoint(point)
+            self.marker_points.Modified()
     
     def update_current_polyline_visualization(self):
         """Update visualization of the current polyline being drawn"""
         if len(self.viz.current_polyline) < 2:
             return
         
-        # Remove previous current polyline visualization
-        try:
-            self.viz.plotter.remove_actor('current_polyline')
-        except:
-            pass
-        
-        # Create polyline from points
-        points = np.array(self.viz.current_polyline)
-        
-        # Create a PolyData object for the line
-        polyline = pv.PolyData()
-        polyline.points = points
+        n_points = len(self.viz.current_polyline)
+        if self.line_conn is None or n_points - 1 > len(self.line_conn):
+            # (Re)allocate with spare capacity; segment i always joins points i and i+1
+            capacity = max(16, 2 * n_points)
+            self.line_conn = np.empty((capacity, 2), dtype=np.int64)  # Matches vtkIdType
+            self.line_conn[:, 0] = np.arange(capacity)  # Start points
+            self.line_conn[:, 1] = np.arange(1, capacity + 1)   # End points
         
-        # Create line connectivity
-        n_points = len(points)
-        lines = np.zeros((n_points - 1, 3), dtype=int)
-        lines[:, 0] = 2  # Each line has 2 points
-        lines[:, 1] = np.arange(n_points - 1)  # Start points
-        lines[:, 2] = np.arange(1, n_points)   # End points
+        first_update = self.line_polydata is None
+        if first_update:
+            self.line_polydata = pv.PolyData()
+            self.line_polydata.SetPoints(vtkPoints())
+            self.line_polydata.SetLines(vtkCellArray())
+        # Wrap the point buffer without copying; the VTK array keeps a reference to it
+        self.line_polydata.GetPoints().SetData(numpy_to_vtk(self.viz.current_polyline.view(), deep=False))
+        # Fixed-size (2-point) cells, so connectivity is used as-is without offsets
+        segments = self.line_conn[:n_points - 1].ravel()
+        self.line_polydata.GetLines().SetData(2, numpy_to_vtkIdTypeArray(segments, deep=False))
+        self.line_polydata.Modified()
         
-        polyline.lines = lines.ravel()
+        if not first_update:
+            return
         
         # Add to plotter with thicker line
-        self.viz.plotter.add_mesh(polyline, color='red', line_width=12, name='current_polyline')
+        self.actors.append(self.viz.plotter.add_mesh(self.line_polydata, color='red', line_width=12,
+                                                     name='current_polyline', render=False))
     
     def finish_current_polyline(self):
         """Finish the current polyline and add it to the collection"""
@@ -279,21 +209,22 @@ class DigitizeMode:
         
         # Store the polyline
         polyline_data = {
-            'points': np.array(self.viz.current_polyline).tolist(),
-            'id': len(self.viz.polylines)
+            'points': self.viz.current_polyline.view().copy(),
+            'id': self.viz.next_polyline_id
         }
+        self.viz.next_polyline_id += 1
         self.viz.polylines.append(polyline_data)
+        self.viz.polylines_changed()
         
-        # Remove current polyline and point visualizations
-        self.clear_current_polyline_visualization()
-        
-        # Add permanent polyline visualization
-        self.viz.add_polyline_to_scene(len(self.viz.polylines) - 1)
+        # Swap the current polyline visualization for the permanent one, rendering once
+        self.clear_current_polyline_visualization(render=False)
+        self.viz.add_polyline_to_scene(len(self.viz.polylines) - 1, render=False)
+        self.viz.plotter.render()
         
         print(f"Finished polyline {len(self.viz.polylines)} with {len(self.viz.current_polyline)} points")
         
         # Clear current polyline data
-        self.viz.current_polyline = []
+        self.viz.current_polyline.clear()
     
     def cancel_current_polyline(self):
         """Cancel the current polyline being drawn"""
@@ -305,24 +236,21 @@ class DigitizeMode:
         
         # Clear visualization and data
         self.clear_current_polyline_visualization()
-        self.viz.current_polyline = []
+        self.viz.current_polyline.clear()
     
-    def clear_current_polyline_visualization(self):
+    def clear_current_polyline_visualization(self, render=True):
         """Clear all current polyline visualizations"""
-        # Remove current polyline
-        try:
-            self.viz.plotter.remove_actor('current_polyline')
-        except:
-            pass
+        self.visualization_pending = False
+        if not self.actors:
+            return
         
-        # Remove all current point markers
-        actors_to_remove = []
-        for name in list(self.viz.plotter.renderer.actors.keys()):
-            if name.startswith('current_point_'):
-                actors_to_remove.append(name)
+        # Remove current polyline and point markers in one batch, without intermediate renders
+        self.viz.plotter.remove_actor(self.actors, render=False)
+        self.actors = []
+        if render:
+            self.viz.plotter.render()
         
-        for actor_name in actors_to_remove:
-            try:
-                self.viz.plotter.remove_actor(actor_name)
-            except:
-                pass
\ No newline at end of file
+        self.marker_points = None
+        self.marker_glyph = None
+        self.line_polydata = None
+        self.line_conn = None
\ No newline at end of file
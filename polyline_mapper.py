@@ -5,31 +5,193 @@ Handles initialization, file loading, and mode coordination.
 
 import pyvista as pv
 import numpy as np
+import logging
 import os
+import hashlib
 from pathlib import Path
 import json
+import copy
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson  # Optional: much faster JSON encoding for the save summary
+except ImportError:
+    orjson = None
 
 # Import mode modules
 from select_mode import SelectMode
-from digitize_mode import DigitizeMode
+from digitize_mode import DigitizeMode, PointBuffer
 from edit_mode import EditMode
 from topology_mode import TopologyMode
 
+logger = logging.getLogger(__name__)
+
+# Opt-in: set POLYLINE_MAPPER_CACHE_DIR to keep parsed meshes as binary VTK files, so reopening a large PLY skips the parse
+MESH_CACHE_DIR = Path(os.environ['POLYLINE_MAPPER_CACHE_DIR']) if os.environ.get('POLYLINE_MAPPER_CACHE_DIR') else None
+MESH_CACHE_MAX_BYTES = 2 * 1024 ** 3  # Least recently used cache files are deleted beyond this total
+save_executor = ThreadPoolExecutor(max_workers=1)  # Writes save summaries in order, off the UI thread
+cache_executor = ThreadPoolExecutor(max_workers=1)  # Writes mesh cache files off the UI thread
+
+
+def file_key(path):
+    """Cache key that changes whenever the file is replaced or modified"""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def read_mesh_cached(ply_path):
+    """pv.read backed by the opt-in on-disk binary copy"""
+    if MESH_CACHE_DIR is None:
+        return pv.read(ply_path)
+    cache_file = MESH_CACHE_DIR / (hashlib.sha1(repr(file_key(ply_path)).encode()).hexdigest() + '.vtp')
+    if cache_file.exists():
+        logger.debug("Reading cached mesh %s for %s", cache_file, ply_path)
+        try:
+            os.utime(cache_file)  # Mark as recently used for pruning
+            mesh = pv.read(cache_file)
+            # VTK reports a corrupt file as a warning and an empty mesh rather than raising
+            if mesh.n_points:
+                return mesh
+            logger.debug("Cached mesh %s is empty or unreadable", cache_file)
+        except (OSError, ValueError) as e:
+            logger.debug("Could not read mesh cache %s: %s", cache_file, e)
+        try:
+            cache_file.unlink(missing_ok=True)
+        except OSError as e:
+            logger.debug("Could not remove mesh cache %s: %s", cache_file, e)
+    mesh = pv.read(ply_path)
+    # Deep copy: the plotter touches the displayed mesh's arrays (e.g. range caches) while the writer runs
+    cache_executor.submit(write_mesh_cache, mesh.copy(deep=True), cache_file)
+    return mesh
+
+
+def write_mesh_cache(mesh, cache_file):
+    """Write a mesh cache file, then prune the cache directory back under MESH_CACHE_MAX_BYTES"""
+    try:
+        # Write under a temporary name so a crash never leaves a truncated cache entry
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        partial_file = cache_file.with_name(cache_file.stem + '.partial.vtp')
+        mesh.save(partial_file)
+        os.replace(partial_file, cache_file)
+        prune_mesh_cache(cache_file.parent, keep=cache_file)
+    except (OSError, ValueError) as e:
+        logger.debug("Could not write mesh cache %s: %s", cache_file, e)
+
+
+def prune_mesh_cache(cache_dir, keep):
+    """Delete the least recently used cache files until the directory fits MESH_CACHE_MAX_BYTES"""
+    entries = []
+    for entry in cache_dir.glob('*.vtp'):
+        if not entry.name.endswith('.partial.vtp'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in entries:
+        if total <= MESH_CACHE_MAX_BYTES:
+            break
+        if entry != keep:
+            entry.unlink(missing_ok=True)
+            total -= size
+            logger.debug("Pruned mesh cache %s", entry)
+
+
+def json_default(obj):
+    """Serialize the numpy arrays and scalars the JSON encoders do not handle natively"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def write_summary(summary_file, summary_data):
+    """Write the save summary as indented JSON, with orjson when it is installed"""
+    try:
+        if orjson is not None:
+            options = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+            Path(summary_file).write_bytes(orjson.dumps(summary_data, default=json_default, option=options))
+        else:
+            with open(summary_file, 'w') as f:
+                json.dump(summary_data, f, indent=2, default=json_default)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Error saving summary: {e}")
+        return
+    print(f"Saved summary: {summary_file}")
+
+
+def xyz_text(points):
+    """Format (N, 3) points as '%.6f %.6f %.6f' rows, matching np.savetxt(fmt='%.6f') output"""
+    # One %-format call over the whole array instead of savetxt's per-row Python loop
+    return ("%.6f %.6f %.6f\n" * len(points)) % tuple(np.asarray(points, dtype=np.float64).ravel())
+
+
+def line_segments(n_points):
+    """Legacy VTK line connectivity joining consecutive points with 2-point segments"""
+    # One flat buffer of [2, i, i+1] triples, already in VTK's id type so it is not converted again
+    lines = np.empty(3 * (n_points - 1), dtype=np.int64)
+    lines[0::3] = 2  # Each line has 2 points
+    lines[1::3] = np.arange(n_points - 1)  # Start points
+    lines[2::3] = lines[1::3] + 1  # End points
+    return lines
+
 
 class InteractiveMeshVisualizer:
+    # Map our simple codes to VTK cursor constants: arrow, hand, crosshair
+    CURSOR_SHAPES = {0: 1, 1: 9, 2: 10}
+    CURSOR_METHODS = ('SetCurrentCursorShape', 'SetCursorShape', 'SetCurrentCursor', 'SetCursor')
+    
+    # Render requests made within this many milliseconds are coalesced into one render
+    RENDER_DEBOUNCE_MS = 16
+    
+    # Key -> handler method name, registered in setup_plotter
+    KEY_BINDINGS = (
+        ('space', 'toggle_mode'),
+        ('Return', 'finish_current_polyline'),
+        ('Escape', 'cancel_current_action'),
+        ('Delete', 'delete_selected_polyline'),
+        ('s', 'save_all_polylines'),
+        ('c', 'clear_all_polylines'),
+        ('d', 'deselect_all'),
+        ('h', 'show_help'),
+        # Disable the default 'e' key exit behavior and add edit mode on 'm'
+        ('e', 'ignore_key'),
+        ('m', 'toggle_edit_mode'),  # 'M' for modify/edit
+        # Topology mode toggle on 't' (replaces trackball reset which is now 'r')
+        ('t', 'toggle_topology_mode'),
+        # Number keys for topology editing
+        ('1', 'set_topology_blind'),
+        ('2', 'set_topology_crossing'),
+        ('3', 'set_topology_abutting'),
+        ('4', 'set_topology_censored'),
+        # Orthogonal view hotkeys
+        ('x', 'view_x_axis'),
+        ('y', 'view_y_axis'),
+        ('z', 'view_z_axis'),
+        ('i', 'view_isometric'),
+        ('r', 'reset_camera'),
+    )
+    
     def __init__(self):
         self.plotter = None
         self.mesh = None
+        self.mesh_size = None  # Mesh bounds diagonal, cached on load
         self.texture = None
         self.mode = 'select'  # 'select', 'digitize', 'edit', 'topology'
-        self.current_polyline = []
+        self.current_polyline = PointBuffer()  # Points of the polyline being digitized
         self.polylines = []
-        self.polyline_actors = []
+        self.polyline_actors = {}  # Scene actor per polyline id, restyled in place on (de)selection
+        self.endpoints = None  # (n_polylines, 2, 3) start/end of every polyline, rebuilt lazily
+        self.polyline_meshes = {}  # Scene PolyData per polyline id, for in-place updates; keys are the polylines in the scene
+        self.next_polyline_id = 0  # Stable polyline ids; scene actors are named by id, not list position
         self.selected_polyline_idx = None
         self.output_directory = None
+        self.render_timer_id = None  # One-shot VTK timer of the pending debounced render
+        self.cursor_setter = None  # Working VTK cursor method, resolved on first use
         
         # Trackball and camera management
         self.last_click_time = 0
@@ -41,6 +203,7 @@ class InteractiveMeshVisualizer:
         # Initialize tkinter root (hidden)
         self.root = tk.Tk()
         self.root.withdraw()  # Hide the main tkinter window
+        self.screen_resolution = None  # Usable window size, measured once
         
         # Initialize mode handlers
         self.select_mode = SelectMode(self)
@@ -99,17 +262,25 @@ class InteractiveMeshVisualizer:
     def load_textured_mesh(self, ply_path, texture_path=None):
         """Load a PLY file and optional texture - using PyVista's built-in picking!"""
         try:
-            # Load the mesh
-            self.mesh = pv.read(ply_path)
-            print(f"Loaded mesh with {self.mesh.n_points} points and {self.mesh.n_cells} cells")
-            print("Using PyVista's built-in surface picking - fast and efficient!")
-            
-            # Load texture if provided
-            if texture_path and os.path.exists(texture_path):
-                self.texture = pv.read_texture(texture_path)
-                print(f"Loaded texture: {texture_path}")
-            else:
-                print("No texture provided or texture file not found")
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                # Decode the texture in the background while the mesh is parsed
+                texture_future = None
+                if texture_path and os.path.exists(texture_path):
+                    texture_future = executor.submit(pv.read_texture, texture_path)
+                
+                # Load the mesh
+                self.mesh = read_mesh_cached(ply_path)
+                bounds = np.array(self.mesh.bounds)
+                self.mesh_size = float(np.linalg.norm(bounds[1::2] - bounds[::2]))
+                print(f"Loaded mesh with {self.mesh.n_points} points and {self.mesh.n_cells} cells")
+                print("Using PyVista's built-in surface picking - fast and efficient!")
+                
+                # Load texture if provided
+                if texture_future is not None:
+                    self.texture = texture_future.result()
+                    print(f"Loaded texture: {texture_path}")
+                else:
+                    print("No texture provided or texture file not found")
                 
             return True
         except Exception as e:
@@ -118,12 +289,13 @@ class InteractiveMeshVisualizer:
     
     def get_screen_resolution(self):
         """Get screen resolution for window maximization"""
+        if self.screen_resolution is not None:
+            return self.screen_resolution
+        
         try:
-            import tkinter as tk
-            root = tk.Tk()
-            screen_width = root.winfo_screenwidth()
-            screen_height = root.winfo_screenheight()
-            root.destroy()
+            # The hidden dialog root can answer this; no need for a second Tk interpreter
+            screen_width = self.root.winfo_screenwidth()
+            screen_height = self.root.winfo_screenheight()
             
             # Leave some margin for taskbar/dock
             usable_width = int(screen_width * 0.95)
@@ -132,7 +304,8 @@ class InteractiveMeshVisualizer:
             print(f"Detected screen resolution: {screen_width}x{screen_height}")
             print(f"Using window size: {usable_width}x{usable_height}")
             
-            return usable_width, usable_height
+            self.screen_resolution = (usable_width, usable_height)
+            return self.screen_resolution
         except Exception as e:
             print(f"Could not detect screen resolution: {e}")
             return 1920, 1080  # Fallback
@@ -145,6 +318,9 @@ class InteractiveMeshVisualizer:
         # Create plotter with detected screen size
         self.plotter = pv.Plotter(window_size=(window_width, window_height))
         
+        # FXAA post-pass instead of 8x multisampling, which is costly at near-fullscreen window sizes
+        self.plotter.enable_anti_aliasing('fxaa')
+        
         # Try additional maximization methods
         try:
             if hasattr(self.plotter, 'render_window'):
@@ -199,34 +375,8 @@ class InteractiveMeshVisualizer:
         
         # Set up key press callbacks with extra error protection
         try:
-            self.plotter.add_key_event('space', self.toggle_mode)
-            self.plotter.add_key_event('Return', self.finish_current_polyline)
-            self.plotter.add_key_event('Escape', self.cancel_current_action)
-            self.plotter.add_key_event('Delete', self.delete_selected_polyline)
-            self.plotter.add_key_event('s', self.save_all_polylines)
-            self.plotter.add_key_event('c', self.clear_all_polylines)
-            self.plotter.add_key_event('d', self.deselect_all)
-            self.plotter.add_key_event('h', self.show_help)
-            
-            # Disable the default 'e' key exit behavior and add edit mode on 'm'
-            self.plotter.add_key_event('e', lambda: None)  # Override with no-op
-            self.plotter.add_key_event('m', self.toggle_edit_mode)  # 'M' for modify/edit
-            
-            # Add topology mode toggle on 't' (replaces trackball reset which is now 'r')
-            self.plotter.add_key_event('t', self.toggle_topology_mode)
-            
-            # Add number keys for topology editing
-            self.plotter.add_key_event('1', self.set_topology_blind)
-            self.plotter.add_key_event('2', self.set_topology_crossing)
-            self.plotter.add_key_event('3', self.set_topology_abutting)
-            self.plotter.add_key_event('4', self.set_topology_censored)
-            
-            # Add orthogonal view hotkeys
-            self.plotter.add_key_event('x', self.view_x_axis)
-            self.plotter.add_key_event('y', self.view_y_axis)
-            self.plotter.add_key_event('z', self.view_z_axis)
-            self.plotter.add_key_event('i', self.view_isometric)
-            self.plotter.add_key_event('r', self.reset_camera)
+            for key, method_name in self.KEY_BINDINGS:
+                self.plotter.add_key_event(key, getattr(self, method_name))
             
             print("Key callbacks registered successfully")
         except Exception as e:
@@ -243,6 +393,12 @@ class InteractiveMeshVisualizer:
         except Exception as e:
             print(f"Trackball style not available: {e}")
         
+        # Let digitize mode defer its redraws until a camera drag ends (style must be final)
+        style = self.plotter.iren.interactor.GetInteractorStyle()
+        style.AddObserver('StartInteractionEvent', self.digitize_mode.on_start_interaction)
+        style.AddObserver('EndInteractionEvent', self.digitize_mode.on_end_interaction)
+        self.plotter.iren.interactor.AddObserver('TimerEvent', self.on_render_timer)
+        
         # Store original camera position for trackball reset
         self.store_original_camera_position()
         
@@ -253,24 +409,79 @@ class InteractiveMeshVisualizer:
         self.select_mode.activate()
         self.show_help()
     
+    def ignore_key(self):
+        """No-op key handler that overrides a default pyvista binding"""
+    
+    def set_cursor(self, cursor_type):
+        """Set the window cursor (0 arrow, 1 hand, 2 crosshair) with the first VTK cursor method that works, cached after the first hit"""
+        vtk_cursor_type = self.CURSOR_SHAPES.get(cursor_type, self.CURSOR_SHAPES[0])
+        # Re-entering a mode keeps the cursor the window already shows
+        render_window = self.plotter.render_window
+        if render_window is not None and render_window.GetCurrentCursor() == vtk_cursor_type:
+            return True
+        if self.cursor_setter is not None:
+            self.cursor_setter(vtk_cursor_type)
+            return True
+        
+        plotter = self.plotter
+        for target in (getattr(plotter, 'iren', None), getattr(plotter, 'render_window', None)):
+            if target is None:
+                continue
+            for method_name in self.CURSOR_METHODS:
+                try:
+                    method = getattr(target, method_name)
+                    method(vtk_cursor_type)
+                except (AttributeError, TypeError):
+                    continue
+                self.cursor_setter = method
+                return True
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            for target in (getattr(plotter, 'iren', None), getattr(plotter, 'render_window', None)):
+                logger.debug("No cursor setter worked; cursor methods on %r: %s",
+                             target, [m for m in dir(target) if 'cursor' in m.lower()])
+        return False
+    
+    def request_render(self):
+        """Render on the next timer tick, coalescing any further requests made before then"""
+        if self.render_timer_id is not None:
+            return
+        iren = self.plotter.iren
+        if iren is None or not iren.initialized:
+            # No event loop to deliver the timer (before show() or off-screen), so render now
+            self.plotter.render()
+            return
+        self.render_timer_id = iren.create_timer(self.RENDER_DEBOUNCE_MS, repeating=False)
+    
+    def on_render_timer(self, obj, event):
+        """Interactor TimerEvent observer - perform the pending debounced render"""
+        if self.render_timer_id is None or obj.GetTimerEventId() != self.render_timer_id:
+            return  # Some other timer (e.g. camera animation)
+        self.render_timer_id = None
+        self.plotter.render()
+    
     def view_x_axis(self):
         """View along X axis (YZ plane)"""
-        self.plotter.view_yz()
+        self.plotter.view_yz(render=False)
+        self.request_render()
         print("View: X-axis (YZ plane)")
     
     def view_y_axis(self):
         """View along Y axis (XZ plane)"""
-        self.plotter.view_xz()
+        self.plotter.view_xz(render=False)
+        self.request_render()
         print("View: Y-axis (XZ plane)")
     
     def view_z_axis(self):
         """View along Z axis (XY plane)"""
-        self.plotter.view_xy()
+        self.plotter.view_xy(render=False)
+        self.request_render()
         print("View: Z-axis (XY plane)")
     
     def view_isometric(self):
         """Isometric view - preserve trackball widget"""
-        self.plotter.view_isometric()
+        self.plotter.view_isometric(render=False)
+        self.request_render()
         # Re-add the trackball widget if it was removed
         try:
             self.plotter.add_orientation_widget(
@@ -293,11 +504,12 @@ class InteractiveMeshVisualizer:
                 self.plotter.camera.position = self.original_camera_position
                 self.plotter.camera.focal_point = self.original_focal_point
                 self.plotter.camera.view_up = [0, 0, 1]  # Reset view up vector
-                self.plotter.render()
+                self.request_render()
                 print("Reset camera to original position")
             else:
                 # Fallback to standard reset if original position not stored
-                self.plotter.reset_camera()
+                self.plotter.reset_camera(render=False)
+                self.request_render()
                 print("Camera reset")
         except Exception as e:
             print(f"Error resetting camera: {e}")
@@ -336,7 +548,7 @@ class InteractiveMeshVisualizer:
     
     def surface_pick_callback(self, *args, **kwargs):
         """Callback for PyVista's surface point picking - routes to appropriate mode handler"""
-        print(f"Surface pick callback called with args: {args}, kwargs: {kwargs}")
+        logger.debug("Surface pick callback called with args: %s, kwargs: %s", args, kwargs)
         
         # Extract the point from different possible callback signatures
         point = None
@@ -353,7 +565,7 @@ class InteractiveMeshVisualizer:
             print("No surface point picked or couldn't extract point from callback")
             return
         
-        print(f"Extracted surface point: {point}")
+        logger.debug("Extracted surface point: %s", point)
         
         # Route to appropriate handler based on current mode
         if self.mode == 'select':
@@ -382,7 +594,6 @@ class InteractiveMeshVisualizer:
                 self.select_mode.activate()
         except Exception as e:
             print(f"Error toggling mode: {e}")
-            import traceback
             traceback.print_exc()
     
     def toggle_edit_mode(self):
@@ -396,7 +607,6 @@ class InteractiveMeshVisualizer:
                 self.edit_mode.activate()
         except Exception as e:
             print(f"Error toggling edit mode: {e}")
-            import traceback
             traceback.print_exc()
     
     def toggle_topology_mode(self):
@@ -410,7 +620,6 @@ class InteractiveMeshVisualizer:
                 self.topology_mode.activate()
         except Exception as e:
             print(f"Error toggling topology mode: {e}")
-            import traceback
             traceback.print_exc()
     
     def set_topology_blind(self):
@@ -451,80 +660,94 @@ class InteractiveMeshVisualizer:
             print("No polyline selected for deletion")
             return
         
-        # Remove from scene
-        actor_name = f'polyline_{self.selected_polyline_idx}'
-        try:
-            self.plotter.remove_actor(actor_name)
-        except:
-            pass
-        
-        # Remove from data
+        # Remove from scene and data; actors are keyed by id, so the other polylines need no redraw
         deleted_idx = self.selected_polyline_idx
-        del self.polylines[self.selected_polyline_idx]
+        deleted = self.polylines.pop(deleted_idx)
+        self.plotter.remove_actor(self.polyline_actors.pop(deleted['id'], None))
+        self.polyline_meshes.pop(deleted['id'], None)
+        self.polylines_changed()
         
         print(f"Deleted polyline {deleted_idx + 1}")
         
         # Clear selection
         self.selected_polyline_idx = None
-        
-        # Refresh all polylines with updated indices
-        self.refresh_polyline_visualization()
     
     def deselect_all(self):
         """Deselect all polylines"""
         if self.selected_polyline_idx is not None:
             old_selected = self.selected_polyline_idx
             self.selected_polyline_idx = None
-            self.add_polyline_to_scene(old_selected)  # Reset color
+            self.set_polyline_style(old_selected)  # Reset color
             print("Deselected all polylines")
     
-    def add_polyline_to_scene(self, polyline_idx):
-        """Add a polyline to the 3D scene with thicker lines"""
+    def add_polyline_to_scene(self, polyline_idx, render=True, selected=None):
+        """Add a polyline to the 3D scene with thicker lines; selected overrides the selection-based style"""
         if polyline_idx >= len(self.polylines):
             return
         
-        points = np.array(self.polylines[polyline_idx]['points'])
+        points = self.polylines[polyline_idx]['points']
         
         # Create polyline
         polyline = pv.PolyData()
         polyline.points = points
+        polyline.lines = line_segments(len(points))
+        self.polyline_meshes[self.polylines[polyline_idx]['id']] = polyline
         
-        # Create line connectivity
-        n_points = len(points)
-        lines = np.zeros((n_points - 1, 3), dtype=int)
-        lines[:, 0] = 2  # Each line has 2 points
-        lines[:, 1] = np.arange(n_points - 1)  # Start points
-        lines[:, 2] = np.arange(1, n_points)   # End points
+        # Color based on selection state with much thicker lines
+        color, line_width = self.polyline_style(polyline_idx, selected)
+        actor_name = self.polyline_actor_name(polyline_idx)
+        
+        self.polyline_actors[self.polylines[polyline_idx]['id']] = self.plotter.add_mesh(
+            polyline, color=color, line_width=line_width, name=actor_name, render=render)
+    
+    def polyline_style(self, polyline_idx, selected=None):
+        """Color and line width of a polyline; selected defaults to the current selection"""
+        if selected is None:
+            selected = polyline_idx == self.selected_polyline_idx
+        return ('yellow', 12) if selected else ('blue', 6)
+    
+    def set_polyline_style(self, polyline_idx, selected=None, render=True):
+        """Restyle a polyline's existing actor in place, adding it to the scene if it has none"""
+        actor = self.polyline_actors.get(self.polylines[polyline_idx]['id'])
+        if actor is None:
+            self.add_polyline_to_scene(polyline_idx, render=render, selected=selected)
+            return
         
-        polyline.lines = lines.ravel()
+        actor.prop.color, actor.prop.line_width = self.polyline_style(polyline_idx, selected)
+        if render:
+            self.request_render()
+    
+    def polyline_actor_name(self, polyline_idx):
+        """Scene actor name of a polyline, keyed by its stable id"""
+        return f"polyline_{self.polylines[polyline_idx]['id']}"
+    
+    def polylines_changed(self):
+        """Drop the modes' geometry caches after polylines are added, removed or reshaped"""
+        self.endpoints = None
+        self.select_mode.invalidate_segments()
+    
+    def get_endpoints(self):
+        """Start and end point of every polyline as an (n_polylines, 2, 3) array, cached until polylines change"""
+        if self.endpoints is None:
+            self.endpoints = np.array([(polyline_data['points'][0], polyline_data['points'][-1])
+                                       for polyline_data in self.polylines]).reshape(-1, 2, 3)
+        return self.endpoints
+    
+    def update_polyline_geometry(self, polyline_idx):
+        """Push a polyline's current points into its existing scene mesh; False if it has none"""
+        polyline_id = self.polylines[polyline_idx]['id']
+        polyline = self.polyline_meshes.get(polyline_id)
+        if polyline is None or polyline_id not in self.polyline_actors:
+            return False
         
-        # Color based on selection state with much thicker lines
-        color = 'yellow' if polyline_idx == self.selected_polyline_idx else 'blue'
-        line_width = 12 if polyline_idx == self.selected_polyline_idx else 6
-        actor_name = f'polyline_{polyline_idx}'
-        
-        self.plotter.add_mesh(polyline, color=color, line_width=line_width, name=actor_name)
-    
-    def refresh_polyline_visualization(self):
-        """Refresh all polyline visualizations with updated indices"""
-        # Remove all polyline actors
-        actors_to_remove = []
-        for name in list(self.plotter.renderer.actors.keys()):
-            if name.startswith('polyline_'):
-                actors_to_remove.append(name)
-        
-        for actor_name in actors_to_remove:
-            try:
-                self.plotter.remove_actor(actor_name)
-            except:
-                pass
-        
-        # Re-add all polylines
-        for i in range(len(self.polylines)):
-            self.add_polyline_to_scene(i)
-    
-    def save_all_polylines(self):
-        """Save all polylines to separate files"""
+        points = self.polylines[polyline_idx]['points']
+        polyline.points = points
+        polyline.lines = line_segments(len(points))
+        polyline.Modified()
+        return True
+    
+    def save_all_polylines(self, export_ascii=True):
+        """Save all polylines to one .npz archive, plus a .txt file per polyline if export_ascii"""
         if not self.polylines:
             print("No polylines to save")
             return
@@ -539,55 +762,54 @@ class InteractiveMeshVisualizer:
         polylines_dir = output_dir / "polylines_output"
         polylines_dir.mkdir(exist_ok=True)
         
-        for i, polyline_data in enumerate(self.polylines):
-            # Save as .txt file
-            txt_filename = polylines_dir / f"polyline_{i+1:03d}.txt"
-            np.savetxt(txt_filename, polyline_data['points'], 
-                      fmt='%.6f', header=f'Polyline {i+1} - X Y Z coordinates')
-            
-            # Save as .dat file (binary)
-            dat_filename = polylines_dir / f"polyline_{i+1:03d}.dat"
-            np.array(polyline_data['points']).tofile(dat_filename)
-            
-            print(f"Saved polyline {i+1}: {txt_filename} and {dat_filename}")
+        # All polylines in one binary write, one (N, 3) float64 array per polyline
+        npz_filename = polylines_dir / "polylines.npz"
+        np.savez_compressed(npz_filename, **{f"polyline_{i+1:03d}": polyline_data['points']
+                                             for i, polyline_data in enumerate(self.polylines)})
+        print(f"Saved {len(self.polylines)} polylines: {npz_filename}")
+        
+        if export_ascii:
+            for i, polyline_data in enumerate(self.polylines):
+                # Save as .txt file
+                txt_filename = polylines_dir / f"polyline_{i+1:03d}.txt"
+                txt_filename.write_bytes((f"# Polyline {i+1} - X Y Z coordinates\n" +
+                                          xyz_text(polyline_data['points'])).encode())
+                
+                print(f"Saved polyline {i+1}: {txt_filename}")
         
         # Also save a summary JSON file with topology data if available
+        # Point arrays are replaced on edit, never written in place, so the writer can use them as-is
         summary_data = {
             'num_polylines': len(self.polylines),
-            'polylines': self.polylines
+            'polylines': [{'points': polyline_data['points']} for polyline_data in self.polylines]
         }
         
         # Add topology data if it exists
         if hasattr(self.topology_mode, 'topology_data') and self.topology_mode.topology_data:
-            summary_data['topology'] = self.topology_mode.topology_data
+            summary_data['topology'] = copy.deepcopy(self.topology_mode.topology_data)  # Terminations are edited in place
             print("Including topology data in summary")
         
+        # Encode and write in the background so the viewer stays responsive
         summary_file = polylines_dir / "polylines_summary.json"
-        with open(summary_file, 'w') as f:
-            json.dump(summary_data, f, indent=2)
+        save_executor.submit(write_summary, summary_file, summary_data)
         
-        print(f"Saved summary: {summary_file}")
         print(f"Total: {len(self.polylines)} polylines saved to {polylines_dir}")
     
     def clear_all_polylines(self):
         """Clear all polylines"""
-        # Remove all polyline actors and current polyline visualization
-        actors_to_remove = []
-        for name in list(self.plotter.renderer.actors.keys()):
-            if (name.startswith('polyline_') or 
-                name == 'current_polyline' or 
-                name.startswith('current_point_')):
-                actors_to_remove.append(name)
-        
-        for actor_name in actors_to_remove:
-            try:
-                self.plotter.remove_actor(actor_name)
-            except:
-                pass
+        # Remove current polyline visualization
+        self.digitize_mode.clear_current_polyline_visualization()
+        
+        # Remove all polyline actors by handle
+        self.plotter.remove_actor(list(self.polyline_actors.values()), render=False)
+        self.request_render()
         
         # Clear data
         self.polylines = []
-        self.current_polyline = []
+        self.polyline_meshes = {}
+        self.polyline_actors = {}
+        self.polylines_changed()
+        self.current_polyline.clear()
         self.selected_polyline_idx = None
         
         print("Cleared all polylines")
@@ -4,14 +4,36 @@ Handles transitions to and from select mode, polyline selection,
 and double-click camera translation.
 """
 
+import logging
+import math
 import numpy as np
 import time
+import traceback
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+
+def segment_squared_distances(point, starts, vectors, lengths_sq):
+    """Squared distance from point to every segment start + t * vector, t clamped to [0, 1]"""
+    point_vecs = point - starts
+    # Project point onto each line; degenerate (zero-length) segments project onto their start
+    t = np.divide(np.einsum('ij,ij->i', point_vecs, vectors), lengths_sq,
+                  out=np.zeros(len(starts)), where=lengths_sq > 0)
+    offsets = point_vecs - np.clip(t, 0, 1)[:, None] * vectors
+    return np.einsum('ij,ij->i', offsets, offsets)
 
 
 class SelectMode:
+    # Below this many segments a brute-force scan beats a KD-tree query
+    SEGMENT_TREE_MIN_SEGMENTS = 256
+    
     def __init__(self, visualizer):
         """Initialize select mode with reference to main visualizer"""
         self.viz = visualizer
+        self.segments = None  # (starts, vectors, squared lengths, owning polyline) of every segment, rebuilt lazily
+        self.segment_tree = None  # KD-tree over segment midpoints, built with the table for larger scenes
+        self.segment_reach = 0.0  # Longest half-segment; widens tree queries so no long segment is missed
         
     def activate(self):
         """Activate select mode - white background, arrow cursor"""
@@ -22,10 +44,7 @@ class SelectMode:
             self.clear_control_point_visualization()
             # Reset selected polyline visualization back to normal blue
             if self.viz.selected_polyline_idx is not None:
-                old_selected = self.viz.selected_polyline_idx
-                self.viz.selected_polyline_idx = None  # Temporarily clear selection
-                self.viz.add_polyline_to_scene(old_selected)  # Redraw as blue
-                self.viz.selected_polyline_idx = old_selected  # Restore selection
+                self.viz.set_polyline_style(self.viz.selected_polyline_idx, selected=False)  # Redraw as blue
         
         # Clear any digitize mode visualization if coming from digitize mode
         if self.viz.mode == 'digitize':
@@ -53,177 +72,17 @@ class SelectMode:
             
             # Set arrow cursor for selection
             cursor_msg = ""
-            if self.set_cursor_style(0):  # Arrow cursor
+            if self.viz.set_cursor(0):  # Arrow cursor
                 cursor_msg = " (arrow cursor)"
             
             print(f"SELECT MODE: Left click to select polylines, D to deselect{cursor_msg}")
             
-            # Force camera update to ensure background color changes
-            self.force_camera_update()
-            
-        except Exception as e:
-            print(f"Error updating select mode display: {e}")
-            import traceback
-            traceback.print_exc()
-    
-    def force_camera_update(self):
-        """Force a tiny camera rotation to trigger background update"""
-        try:
-            camera = self.viz.plotter.camera
-            if camera is not None:
-                original_azimuth = camera.azimuth
-                camera.azimuth = original_azimuth + 0.01
-                self.viz.plotter.render()
-                camera.azimuth = original_azimuth
-                self.viz.plotter.render()
-        except Exception as camera_e:
-            print(f"Camera update failed (non-critical): {camera_e}")
-            # Just render without camera manipulation
+            # Render once so the background color change shows up
             self.viz.plotter.render()
-    
-    def set_cursor_style(self, cursor_type):
-        """Set cursor style using VTK interactor - with VTK constants and detailed debugging"""
-        try:
-            print(f"DEBUG: Attempting to set cursor to type {cursor_type}")
-            
-            # VTK cursor constants (these are the actual VTK values)
-            VTK_CURSOR_DEFAULT = 0
-            VTK_CURSOR_ARROW = 1
-            VTK_CURSOR_SIZENE = 2
-            VTK_CURSOR_SIZENW = 3
-            VTK_CURSOR_SIZESW = 4
-            VTK_CURSOR_SIZESE = 5
-            VTK_CURSOR_SIZENS = 6
-            VTK_CURSOR_SIZEWE = 7
-            VTK_CURSOR_SIZEALL = 8
-            VTK_CURSOR_HAND = 9
-            VTK_CURSOR_CROSSHAIR = 10
-            
-            # Map our simple codes to VTK constants
-            cursor_map = {
-                0: VTK_CURSOR_ARROW,      # Arrow
-                1: VTK_CURSOR_HAND,       # Hand  
-                2: VTK_CURSOR_CROSSHAIR   # Crosshair
-            }
-            
-            vtk_cursor_type = cursor_map.get(cursor_type, VTK_CURSOR_ARROW)
-            print(f"DEBUG: Mapped cursor {cursor_type} to VTK constant {vtk_cursor_type}")
-            
-            # Check what VTK components are available
-            print(f"DEBUG: Has iren: {hasattr(self.viz.plotter, 'iren')}")
-            print(f"DEBUG: Has render_window: {hasattr(self.viz.plotter, 'render_window')}")
-            print(f"DEBUG: Has window: {hasattr(self.viz.plotter, 'window')}")
-            
-            # Method 1: Direct VTK render window interactor
-            if hasattr(self.viz.plotter, 'iren') and self.viz.plotter.iren is not None:
-                interactor = self.viz.plotter.iren
-                print(f"DEBUG: Got interactor type: {type(interactor)}")
-                print(f"DEBUG: Interactor class name: {interactor.__class__.__name__}")
-                
-                # List all available methods on interactor
-                cursor_related_methods = [m for m in dir(interactor) if 'cursor' in m.lower()]
-                print(f"DEBUG: Available cursor-related methods on interactor: {cursor_related_methods}")
-                
-                # Try different VTK cursor methods with correct constants
-                cursor_methods = [
-                    ('SetCurrentCursorShape', vtk_cursor_type),
-                    ('SetCursorShape', vtk_cursor_type), 
-                    ('SetCurrentCursor', vtk_cursor_type),
-                    ('SetCursor', vtk_cursor_type)
-                ]
-                
-                for method_name, cursor_value in cursor_methods:
-                    if hasattr(interactor, method_name):
-                        print(f"DEBUG: Found method {method_name} on interactor")
-                        try:
-                            method = getattr(interactor, method_name)
-                            method(cursor_value)
-                            print(f"DEBUG: Successfully called {method_name}({cursor_value})")
-                            self.viz.plotter.render()
-                            return True
-                        except Exception as e:
-                            print(f"DEBUG: {method_name} failed: {e}")
-                    else:
-                        print(f"DEBUG: Method {method_name} NOT found on interactor")
-                
-                # Try through the render window from interactor
-                if hasattr(interactor, 'GetRenderWindow'):
-                    render_window = interactor.GetRenderWindow()
-                    print(f"DEBUG: Got render window from interactor: {type(render_window)}")
-                    
-                    if render_window:
-                        # List cursor methods on render window
-                        rw_cursor_methods = [m for m in dir(render_window) if 'cursor' in m.lower()]
-                        print(f"DEBUG: Cursor methods on render_window: {rw_cursor_methods}")
-                        
-                        cursor_rw_methods = [
-                            ('SetCurrentCursor', vtk_cursor_type),
-                            ('SetCursor', vtk_cursor_type),
-                            ('SetDesiredUpdateRate', None)  # Sometimes needed to refresh
-                        ]
-                        
-                        for method_name, cursor_value in cursor_rw_methods:
-                            if method_name == 'SetDesiredUpdateRate':
-                                continue
-                            if hasattr(render_window, method_name):
-                                print(f"DEBUG: Trying render_window.{method_name}")
-                                try:
-                                    method = getattr(render_window, method_name)
-                                    method(cursor_value)
-                                    render_window.Render()  # Force render on window
-                                    print(f"DEBUG: Successfully called render_window.{method_name}")
-                                    return True
-                                except Exception as e:
-                                    print(f"DEBUG: render_window.{method_name} failed: {e}")
-            
-            # Method 2: Through plotter's render_window directly
-            if hasattr(self.viz.plotter, 'render_window') and self.viz.plotter.render_window:
-                print("DEBUG: Trying through plotter.render_window directly")
-                render_window = self.viz.plotter.render_window
-                print(f"DEBUG: Direct render_window type: {type(render_window)}")
-                
-                # Check for VTK render window
-                if hasattr(render_window, '__class__'):
-                    print(f"DEBUG: Render window class: {render_window.__class__.__name__}")
-                
-                cursor_rw_methods = [
-                    ('SetCurrentCursor', vtk_cursor_type),
-                    ('SetCursor', vtk_cursor_type)
-                ]
-                
-                for method_name, cursor_value in cursor_rw_methods:
-                    if hasattr(render_window, method_name):
-                        print(f"DEBUG: Found {method_name} on direct render_window")
-                        try:
-                            method = getattr(render_window, method_name)
-                            method(cursor_value)
-                            render_window.Render()
-                            print(f"DEBUG: Successfully set cursor via direct render_window")
-                            return True
-                        except Exception as e:
-                            print(f"DEBUG: Direct render_window.{method_name} failed: {e}")
-            
-            # Method 3: Try through plotter.window (sometimes different from render_window)
-            if hasattr(self.viz.plotter, 'window'):
-                print("DEBUG: Trying through plotter.window")
-                window = self.viz.plotter.window
-                if window and hasattr(window, 'SetCurrentCursor'):
-                    try:
-                        window.SetCurrentCursor(vtk_cursor_type)
-                        print("DEBUG: Set cursor through plotter.window")
-                        return True
-                    except Exception as e:
-                        print(f"DEBUG: plotter.window cursor setting failed: {e}")
-            
-            print("DEBUG: WARNING - No cursor methods worked. Cursor will remain default.")
-            print("DEBUG: This might be a platform/backend limitation")
-            return False
             
         except Exception as e:
-            print(f"DEBUG: Cursor setting completely failed with exception: {e}")
-            import traceback
+            print(f"Error updating select mode display: {e}")
             traceback.print_exc()
-            return False
     
     def handle_pick(self, surface_point):
         """Handle surface picking in select mode - includes double-click detection"""
@@ -248,12 +107,12 @@ class SelectMode:
         
         # Check spatial threshold (must be reasonably close to previous click)
         if self.viz.last_click_point is not None:
-            distance = np.linalg.norm(np.array(surface_point) - np.array(self.viz.last_click_point))
-            mesh_size = np.linalg.norm(np.array(self.viz.mesh.bounds[1::2]) - np.array(self.viz.mesh.bounds[::2]))
+            distance = math.dist(surface_point, self.viz.last_click_point)  # Scalar; no arrays for one 3-vector
+            mesh_size = self.viz.mesh_size
             spatial_threshold = mesh_size * 0.05  # 5% of mesh size
             
             if distance < spatial_threshold:
-                print(f"Double-click detected! Distance: {distance:.6f}, threshold: {spatial_threshold:.6f}")
+                logger.debug("Double-click detected! Distance: %.6f, threshold: %.6f", distance, spatial_threshold)
                 # Reset click tracking
                 self.viz.last_click_time = 0
                 self.viz.last_click_point = None
@@ -275,9 +134,8 @@ class SelectMode:
             current_focal_point = np.array(self.viz.plotter.camera.focal_point)
             target_point = np.array(surface_point)
             
-            print(f"Current camera position: {current_position}")
-            print(f"Current focal point: {current_focal_point}")
-            print(f"Target point: {target_point}")
+            logger.debug("Current camera position: %s, focal point: %s, target point: %s",
+                         current_position, current_focal_point, target_point)
             
             # Calculate 50% translation towards the clicked point
             # Move both camera position and focal point by the same vector
@@ -286,9 +144,8 @@ class SelectMode:
             new_position = current_position + translation_vector
             new_focal_point = current_focal_point + translation_vector
             
-            print(f"Translation vector: {translation_vector}")
-            print(f"New camera position: {new_position}")
-            print(f"New focal point: {new_focal_point}")
+            logger.debug("Translation vector: %s, new camera position: %s, new focal point: %s",
+                         translation_vector, new_position, new_focal_point)
             
             # Apply new camera settings
             self.viz.plotter.camera.position = new_position
@@ -300,32 +157,34 @@ class SelectMode:
             
         except Exception as e:
             print(f"Error translating camera: {e}")
-            import traceback
             traceback.print_exc()
     
     def select_polyline_near_point(self, click_point):
         """Select a polyline near the clicked point or deselect if clicking on selected polyline"""
-        min_distance = float('inf')
         closest_polyline_idx = None
         
         # Calculate smaller, more precise selection threshold
-        mesh_size = np.linalg.norm(np.array(self.viz.mesh.bounds[1::2]) - np.array(self.viz.mesh.bounds[::2]))
+        mesh_size = self.viz.mesh_size
         selection_threshold = mesh_size * 0.008  # 0.8% of mesh size
         
-        # Check distance to all polylines with better tolerance
-        for i, polyline_data in enumerate(self.viz.polylines):
-            points = np.array(polyline_data['points'])
-            
-            # Check distance to line segments, not just points
-            for j in range(len(points) - 1):
-                p1, p2 = points[j], points[j + 1]
-                # Distance from point to line segment
-                distance = self.point_to_line_distance(click_point, p1, p2)
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_polyline_idx = i
-        
-        if closest_polyline_idx is not None and min_distance < selection_threshold:
+        # Check distance to line segments, not just points, of all polylines at once
+        if self.segments is None:
+            self.build_segment_table()
+        starts, vectors, lengths_sq, owners = self.segments
+        click_point = np.asarray(click_point, dtype=np.float64)
+        if self.segment_tree is not None:
+            # Only segments whose midpoint is within threshold + half the longest segment can be close enough
+            rows = np.asarray(self.segment_tree.query_ball_point(click_point, r=selection_threshold + self.segment_reach),
+                              dtype=np.intp)
+            starts, vectors, lengths_sq, owners = starts[rows], vectors[rows], lengths_sq[rows], owners[rows]
+        
+        squared_distances = segment_squared_distances(click_point, starts, vectors, lengths_sq)
+        if len(squared_distances):
+            closest = int(squared_distances.argmin())
+            if squared_distances[closest] < selection_threshold ** 2:
+                closest_polyline_idx = int(owners[closest])
+        
+        if closest_polyline_idx is not None:
             # If clicking on already selected polyline, deselect it
             if closest_polyline_idx == self.viz.selected_polyline_idx:
                 self.viz.deselect_all()
@@ -336,55 +195,41 @@ class SelectMode:
             # Deselect if clicked far from any polyline
             self.viz.deselect_all()
     
-    def point_to_line_distance(self, point, line_start, line_end):
-        """Calculate distance from a point to a line segment"""
-        point = np.array(point)
-        line_start = np.array(line_start)
-        line_end = np.array(line_end)
-        
-        # Vector from line_start to line_end
-        line_vec = line_end - line_start
-        # Vector from line_start to point
-        point_vec = point - line_start
-        
-        # Handle degenerate case where line_start == line_end
-        line_len_sq = np.dot(line_vec, line_vec)
-        if line_len_sq == 0:
-            return np.linalg.norm(point_vec)
-        
-        # Project point onto line
-        t = max(0, min(1, np.dot(point_vec, line_vec) / line_len_sq))
-        projection = line_start + t * line_vec
-        
-        return np.linalg.norm(point - projection)
+    def build_segment_table(self):
+        """Stack the segments of all polylines into flat arrays for one vectorized distance pass"""
+        polylines = self.viz.polylines
+        if polylines:
+            starts = np.concatenate([polyline_data['points'][:-1] for polyline_data in polylines])
+            ends = np.concatenate([polyline_data['points'][1:] for polyline_data in polylines])
+        else:
+            starts = ends = np.empty((0, 3))
+        owners = np.repeat(np.arange(len(polylines)), [len(polyline_data['points']) - 1 for polyline_data in polylines])
+        vectors = ends - starts
+        lengths_sq = np.einsum('ij,ij->i', vectors, vectors)
+        self.segments = (starts, vectors, lengths_sq, owners)
+        
+        self.segment_tree = None
+        if len(starts) >= self.SEGMENT_TREE_MIN_SEGMENTS:
+            self.segment_tree = cKDTree(starts + 0.5 * vectors, leafsize=32)
+            self.segment_reach = 0.5 * np.sqrt(lengths_sq.max())
+    
+    def invalidate_segments(self):
+        """Drop the cached segment table after polylines are added, removed or reshaped"""
+        self.segments = None
+        self.segment_tree = None
     
     def select_polyline(self, polyline_idx):
         """Select a polyline"""
         # Deselect previous
         if self.viz.selected_polyline_idx is not None:
-            self.viz.add_polyline_to_scene(self.viz.selected_polyline_idx)  # Reset color
+            self.viz.set_polyline_style(self.viz.selected_polyline_idx)  # Reset color
         
         self.viz.selected_polyline_idx = polyline_idx
-        self.viz.add_polyline_to_scene(polyline_idx)  # Highlight
+        self.viz.set_polyline_style(polyline_idx)  # Highlight
         
         print(f"Selected polyline {polyline_idx + 1} (Press M to edit, Delete to remove)")
     
     def clear_control_point_visualization(self, polyline_idx=None):
         """Clear control point visualizations from edit mode"""
-        try:
-            actors_to_remove = []
-            for name in list(self.viz.plotter.renderer.actors.keys()):
-                if polyline_idx is not None:
-                    if name.startswith(f'control_point_{polyline_idx}_'):
-                        actors_to_remove.append(name)
-                else:
-                    if name.startswith('control_point_'):
-                        actors_to_remove.append(name)
-            
-            for actor_name in actors_to_remove:
-                try:
-                    self.viz.plotter.remove_actor(actor_name)
-                except:
-                    pass
-        except Exception as e:
-            print(f"Error clearing control point visualization: {e}")
\ No newline at end of file
+        # Edit mode tracks the actors it added, so no scan over the renderer's actors is needed
+        self.viz.edit_mode.clear_control_point_visualization(polyline_idx)
\ No newline at end of file
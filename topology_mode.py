@@ -4,25 +4,59 @@ Handles fracture trace topology analysis including automated detection
 and manual editing of termination styles (Blind, Crossing, Abutting, Censored).
 """
 
+import logging
 import numpy as np
 import pyvista as pv
 import tkinter as tk
+import traceback
+from scipy.spatial import cKDTree
 from tkinter import messagebox
 
+from edit_mode import squared_distances
+
+logger = logging.getLogger(__name__)
+
+
+def point_segment_squared_distances(points, starts, vectors, lengths_sq):
+    """Squared distance from each point (..., 3) to each segment start + t * vector, t clamped to [0, 1]; shape (..., n_segments)"""
+    points = np.asarray(points)[..., None, :]
+    # Project onto each line, clamped to the segment; degenerate segments project onto their start
+    t = np.divide(np.einsum('...ij,ij->...i', points - starts, vectors), lengths_sq,
+                  out=np.zeros(points.shape[:-2] + lengths_sq.shape), where=lengths_sq > 0)
+    offsets = points - (starts + np.clip(t, 0, 1)[..., None] * vectors)
+    return np.einsum('...k,...k->...', offsets, offsets)
+
 
 class TopologyMode:
+    # Vertex-segment pairs measured per block in polylines_intersect, bounding its temporaries (~1.5 MB each)
+    INTERSECT_BLOCK_PAIRS = 65536
+    
+    # Height of the endpoint label letters as a fraction of mesh size
+    LABEL_HEIGHT_FRACTION = 0.015
+    
     def __init__(self, visualizer):
         """Initialize topology mode with reference to main visualizer"""
         self.viz = visualizer
         self.topology_data = {}  # Store topology for each polyline
         self.boundary_vertices = None  # Mesh boundary vertices
+        self.boundary_tree = None  # KD-tree over boundary vertices for nearest-boundary queries
+        self.boundary_mesh = None  # Mesh the boundary vertices and tree were computed from
+        self.segment_table = None  # (starts, vectors, squared lengths) of all segments stacked, built per detection run
+        self.segment_owners = None  # Polyline index of each row of segment_table
+        self.segment_tree = None  # KD-tree over segment midpoints
+        self.segment_reach = 0.0  # tau plus the longest half-segment; any segment within tau has its midpoint this close
+        self.segment_arrays = []  # (starts, vectors, squared lengths) of each polyline's segments, built per detection run
+        self.polyline_bounds = None  # (n, 2, 3) min/max corners of each polyline's bounding box, built with segment_arrays
+        self.pair_intersections = {}  # polylines_intersect result per (lower, higher) index pair, reset per detection run
         self.selected_endpoint = None  # Currently selected endpoint for editing
+        self.label_actors = {}  # Merged label actor per termination type, removed by handle
+        self.label_templates = {}  # Scaled 3D text mesh per (letter, height), tessellated once and glyphed per type
         self.tau_threshold = None  # Distance threshold for topology detection
         
     def activate(self):
         """Activate topology mode - goldenrod background, crosshair cursor"""
         try:
-            print("DEBUG: 'T' key pressed - entering topology mode...")
+            logger.debug("'T' key pressed - entering topology mode...")
             
             # Check if we have polylines
             if not hasattr(self.viz, 'polylines') or len(self.viz.polylines) == 0:
@@ -34,7 +68,7 @@ class TopologyMode:
                 print("ERROR: Plotter not initialized")
                 return
             
-            print("DEBUG: Switching to topology mode")
+            logger.debug("Switching to topology mode")
             
             # Set mode
             self.viz.mode = 'topology'
@@ -77,7 +111,6 @@ class TopologyMode:
             
         except Exception as e:
             print(f"CRITICAL ERROR in activate topology mode: {e}")
-            import traceback
             traceback.print_exc()
             
             # Try to revert to safe state
@@ -100,75 +133,18 @@ class TopologyMode:
             
             # Set crosshair cursor for precision
             cursor_msg = ""
-            if self.set_cursor_style(2):  # Crosshair cursor
+            if self.viz.set_cursor(2):  # Crosshair cursor
                 cursor_msg = " (crosshair cursor)"
             
             print(f"TOPOLOGY MODE: Analyzing fracture trace terminations{cursor_msg}")
             
-            # Force camera update to ensure background color changes
-            self.force_camera_update()
+            # Render once so the background color change shows up
+            self.viz.plotter.render()
             
         except Exception as e:
             print(f"Error updating topology mode display: {e}")
-            import traceback
             traceback.print_exc()
     
-    def force_camera_update(self):
-        """Force a tiny camera rotation to trigger background update"""
-        try:
-            camera = self.viz.plotter.camera
-            if camera is not None:
-                original_azimuth = camera.azimuth
-                camera.azimuth = original_azimuth + 0.01
-                self.viz.plotter.render()
-                camera.azimuth = original_azimuth
-                self.viz.plotter.render()
-        except Exception as camera_e:
-            print(f"Camera update failed (non-critical): {camera_e}")
-            self.viz.plotter.render()
-    
-    def set_cursor_style(self, cursor_type):
-        """Set cursor style using VTK interactor - crosshair for topology mode"""
-        try:
-            # VTK cursor constants
-            VTK_CURSOR_ARROW = 1
-            VTK_CURSOR_HAND = 9
-            VTK_CURSOR_CROSSHAIR = 10
-            
-            cursor_map = {
-                0: VTK_CURSOR_ARROW,
-                1: VTK_CURSOR_HAND,
-                2: VTK_CURSOR_CROSSHAIR
-            }
-            
-            vtk_cursor_type = cursor_map.get(cursor_type, VTK_CURSOR_ARROW)
-            
-            if hasattr(self.viz.plotter, 'iren') and self.viz.plotter.iren is not None:
-                interactor = self.viz.plotter.iren
-                
-                cursor_methods = [
-                    'SetCurrentCursorShape',
-                    'SetCursorShape',
-                    'SetCurrentCursor',
-                    'SetCursor'
-                ]
-                
-                for method_name in cursor_methods:
-                    if hasattr(interactor, method_name):
-                        try:
-                            method = getattr(interactor, method_name)
-                            method(vtk_cursor_type)
-                            self.viz.plotter.render()
-                            return True
-                        except:
-                            pass
-            
-            return False
-            
-        except Exception as e:
-            print(f"DEBUG: Cursor setting failed: {e}")
-            return False
-    
     def ask_automated_detection(self):
         """Ask user if they want automated topology detection"""
         try:
@@ -195,32 +171,24 @@ class TopologyMode:
                 print("ERROR: No mesh available")
                 return None
             
-            # Extract edges from mesh
-            edges = self.viz.mesh.extract_all_edges()
-            
             # Get mesh faces (triangles)
             faces = self.viz.mesh.faces.reshape(-1, 4)[:, 1:]  # Skip count, get vertex indices
             
-            # Count edge occurrences
-            edge_counts = {}
-            for face in faces:
-                # Create edges from triangle vertices
-                for i in range(3):
-                    v1, v2 = face[i], face[(i + 1) % 3]
-                    edge = tuple(sorted([v1, v2]))
-                    edge_counts[edge] = edge_counts.get(edge, 0) + 1
+            # All three edges of every triangle, vertex indices sorted so a shared edge matches itself
+            edges = np.sort(np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]), axis=1)
+            
+            # Count edge occurrences, encoding each edge as one integer so the counting is a 1D np.unique
+            n_points = self.viz.mesh.n_points
+            edge_keys, edge_counts = np.unique(edges[:, 0].astype(np.int64) * n_points + edges[:, 1], return_counts=True)
             
             # Boundary edges appear exactly once
-            boundary_edges = [edge for edge, count in edge_counts.items() if count == 1]
+            boundary_edges = edge_keys[edge_counts == 1]
             
             # Get unique boundary vertex indices
-            boundary_vertex_indices = set()
-            for edge in boundary_edges:
-                boundary_vertex_indices.add(edge[0])
-                boundary_vertex_indices.add(edge[1])
+            boundary_vertex_indices = np.unique(np.concatenate([boundary_edges // n_points, boundary_edges % n_points]))
             
             # Get actual boundary vertex coordinates
-            boundary_vertices = self.viz.mesh.points[list(boundary_vertex_indices)]
+            boundary_vertices = self.viz.mesh.points[boundary_vertex_indices]
             
             print(f"Found {len(boundary_vertices)} boundary vertices from {len(boundary_edges)} boundary edges")
             
@@ -228,27 +196,18 @@ class TopologyMode:
             
         except Exception as e:
             print(f"Error computing boundary vertices: {e}")
-            import traceback
             traceback.print_exc()
             return None
     
     def calculate_mean_vertex_spacing(self):
-        """Calculate mean vertex spacing across all polylines for threshold"""
+        """Calculate mean vertex spacing across all polylines for threshold, from the cached segment arrays"""
         try:
-            total_distance = 0
-            total_segments = 0
-            
-            for polyline_data in self.viz.polylines:
-                points = np.array(polyline_data['points'])
-                for i in range(len(points) - 1):
-                    dist = np.linalg.norm(points[i + 1] - points[i])
-                    total_distance += dist
-                    total_segments += 1
+            segment_lengths = np.sqrt(np.concatenate([lengths_sq for _, _, lengths_sq in self.segment_arrays]))
             
-            if total_segments == 0:
+            if len(segment_lengths) == 0:
                 return 0.01  # Fallback
             
-            mean_spacing = total_distance / total_segments
+            mean_spacing = segment_lengths.mean()
             print(f"Mean vertex spacing: {mean_spacing:.6f}")
             return mean_spacing
             
@@ -259,14 +218,27 @@ class TopologyMode:
     def run_automated_detection(self):
         """Run automated topology detection for all polylines"""
         try:
-            # Compute boundary vertices
-            self.boundary_vertices = self.compute_mesh_boundary_vertices()
+            # Compute boundary vertices; they only change with the mesh, so later activations reuse them
+            if self.boundary_mesh is not self.viz.mesh:
+                self.boundary_vertices = self.compute_mesh_boundary_vertices()
+                self.boundary_tree = None
+                if self.boundary_vertices is not None and len(self.boundary_vertices):
+                    self.boundary_tree = cKDTree(self.boundary_vertices)
+                # A failed computation is retried on the next run
+                self.boundary_mesh = self.viz.mesh if self.boundary_vertices is not None else None
+            
+            # Segment arrays are derived once here and shared by every endpoint and polyline pair below
+            self.build_segment_arrays()
             
             # Calculate threshold (2x mean vertex spacing)
             mean_spacing = self.calculate_mean_vertex_spacing()
             self.tau_threshold = 2.0 * mean_spacing
             print(f"Using tau threshold: {self.tau_threshold:.6f}")
             
+            # Index segment midpoints so each endpoint only checks segments that can be within tau
+            self.build_segment_index()
+            self.pair_intersections = {}
+            
             # Initialize topology for all polylines
             for i in range(len(self.viz.polylines)):
                 self.topology_data[i] = {
@@ -282,13 +254,12 @@ class TopologyMode:
             
         except Exception as e:
             print(f"Error in automated detection: {e}")
-            import traceback
             traceback.print_exc()
     
     def analyze_polyline_topology(self, polyline_idx):
         """Analyze topology for a single polyline"""
         try:
-            points = np.array(self.viz.polylines[polyline_idx]['points'])
+            points = self.viz.polylines[polyline_idx]['points']
             
             if len(points) < 2:
                 return
@@ -298,12 +269,12 @@ class TopologyMode:
             
             # Analyze start point
             start_type, start_intersections = self.classify_endpoint(
-                polyline_idx, start_point, points, is_start=True
+                polyline_idx, start_point, is_start=True
             )
             
             # Analyze end point
             end_type, end_intersections = self.classify_endpoint(
-                polyline_idx, end_point, points, is_start=False
+                polyline_idx, end_point, is_start=False
             )
             
             # Store results
@@ -318,48 +289,53 @@ class TopologyMode:
         except Exception as e:
             print(f"Error analyzing polyline {polyline_idx}: {e}")
     
-    def classify_endpoint(self, polyline_idx, endpoint, polyline_points, is_start):
+    def classify_endpoint(self, polyline_idx, endpoint, is_start):
         """Classify a single endpoint and return type and intersecting polylines"""
         intersecting_polylines = []
         
         # Check distance to boundary first (highest priority)
-        if self.boundary_vertices is not None:
-            min_boundary_dist = self.min_distance_to_points(endpoint, self.boundary_vertices)
+        if self.boundary_tree is not None:
+            min_boundary_dist, _ = self.boundary_tree.query(endpoint)
             if min_boundary_dist < self.tau_threshold:
                 return 'C', intersecting_polylines  # Censored
         
         # Check relationships with other polylines
-        min_dist_to_others = float('inf')
+        min_dist_sq_to_others = float('inf')
+        tau_sq = self.tau_threshold ** 2  # Distances below stay squared; only the comparisons need them
         intersects_within_tau = False
         within_tau_of_segment = False
         
-        for j, other_polyline in enumerate(self.viz.polylines):
+        # Check distance to the segments of other polylines near enough to matter, all at once
+        polylines_within_tau = set()
+        rows = np.asarray(self.segment_tree.query_ball_point(endpoint, r=self.segment_reach), dtype=np.intp)
+        rows = rows[self.segment_owners[rows] != polyline_idx]
+        if len(rows):
+            starts, vectors, lengths_sq = self.segment_table
+            seg_dists_sq = point_segment_squared_distances(endpoint, starts[rows], vectors[rows], lengths_sq[rows])
+            min_dist_sq_to_others = seg_dists_sq.min()
+            polylines_within_tau = set(self.segment_owners[rows[seg_dists_sq < tau_sq]].tolist())
+            within_tau_of_segment = bool(polylines_within_tau)
+        
+        for j in range(len(self.viz.polylines)):
             if j == polyline_idx:
                 continue
             
-            other_points = np.array(other_polyline['points'])
+            # Listed in index order together with intersecting pairs, as the per-polyline scan did
+            if j in polylines_within_tau:
+                intersecting_polylines.append(j)
             
-            # Check distance to segments
-            for k in range(len(other_points) - 1):
-                seg_dist = self.point_to_segment_distance(
-                    endpoint, other_points[k], other_points[k + 1]
-                )
-                
-                if seg_dist < min_dist_to_others:
-                    min_dist_to_others = seg_dist
-                
-                if seg_dist < self.tau_threshold:
-                    within_tau_of_segment = True
-                    intersecting_polylines.append(j)
-            
-            # Check if polylines actually intersect (line-line distance)
-            if self.polylines_intersect(polyline_points, other_points, self.tau_threshold):
+            # Check if polylines actually intersect (line-line distance); symmetric and independent
+            # of the endpoint, so each pair is tested once per run rather than once per endpoint
+            pair = (min(polyline_idx, j), max(polyline_idx, j))
+            if pair not in self.pair_intersections:
+                self.pair_intersections[pair] = self.polylines_intersect(*pair, self.tau_threshold)
+            if self.pair_intersections[pair]:
                 intersects_within_tau = True
                 if j not in intersecting_polylines:
                     intersecting_polylines.append(j)
         
         # Apply classification logic
-        if min_dist_to_others > self.tau_threshold:
+        if min_dist_sq_to_others > tau_sq:
             return 'B', intersecting_polylines  # Blind
         elif intersects_within_tau and not within_tau_of_segment:
             return 'X', intersecting_polylines  # Crossing
@@ -368,50 +344,48 @@ class TopologyMode:
         else:
             return 'B', intersecting_polylines  # Default to blind
     
-    def min_distance_to_points(self, point, points_array):
-        """Calculate minimum distance from point to array of points"""
-        distances = np.linalg.norm(points_array - point, axis=1)
-        return np.min(distances)
+    def build_segment_index(self):
+        """Stack all segments and build the KD-tree over their midpoints used to find segments near an endpoint"""
+        starts, vectors, lengths_sq = (np.concatenate(arrays) for arrays in zip(*self.segment_arrays))
+        self.segment_table = (starts, vectors, lengths_sq)
+        self.segment_owners = np.repeat(np.arange(len(self.segment_arrays)), [len(segments[0]) for segments in self.segment_arrays])
+        self.segment_tree = cKDTree(starts + 0.5 * vectors)
+        self.segment_reach = self.tau_threshold + 0.5 * np.sqrt(lengths_sq.max())
     
-    def point_to_segment_distance(self, point, seg_start, seg_end):
-        """Calculate distance from point to line segment"""
-        point = np.array(point)
-        seg_start = np.array(seg_start)
-        seg_end = np.array(seg_end)
-        
-        line_vec = seg_end - seg_start
-        point_vec = point - seg_start
-        
-        line_len_sq = np.dot(line_vec, line_vec)
-        if line_len_sq == 0:
-            return np.linalg.norm(point_vec)
-        
-        t = max(0, min(1, np.dot(point_vec, line_vec) / line_len_sq))
-        projection = seg_start + t * line_vec
-        
-        return np.linalg.norm(point - projection)
+    def build_segment_arrays(self):
+        """Cache segment starts, vectors and squared lengths plus the bounding box of every polyline for this detection run"""
+        self.segment_arrays = []
+        for polyline_data in self.viz.polylines:
+            points = polyline_data['points']
+            vectors = np.diff(points, axis=0)
+            self.segment_arrays.append((points[:-1], vectors, np.einsum('ij,ij->i', vectors, vectors)))
+        self.polyline_bounds = np.array([(polyline_data['points'].min(axis=0), polyline_data['points'].max(axis=0))
+                                         for polyline_data in self.viz.polylines])
     
-    def polylines_intersect(self, points1, points2, threshold):
+    def polylines_intersect(self, polyline_idx, other_idx, threshold):
         """Check if two polylines intersect within threshold"""
-        for i in range(len(points1) - 1):
-            for j in range(len(points2) - 1):
-                dist = self.segment_to_segment_distance(
-                    points1[i], points1[i + 1],
-                    points2[j], points2[j + 1]
-                )
-                if dist < threshold:
-                    return True
-        return False
+        segments1 = self.segment_arrays[polyline_idx]
+        segments2 = self.segment_arrays[other_idx]
+        if not len(segments1[0]) or not len(segments2[0]):
+            return False
+        # Boxes at least threshold apart along any axis put every point pair at least that far apart
+        (min1, max1), (min2, max2) = self.polyline_bounds[polyline_idx], self.polyline_bounds[other_idx]
+        if (min1 - max2 >= threshold).any() or (min2 - max1 >= threshold).any():
+            return False
+        # Segment pairs are compared through their end points (not a true segment-segment distance),
+        # which amounts to every vertex of each polyline against every segment of the other
+        threshold_sq = threshold ** 2
+        return (self.any_vertex_within(self.viz.polylines[polyline_idx]['points'], segments2, threshold_sq) or
+                self.any_vertex_within(self.viz.polylines[other_idx]['points'], segments1, threshold_sq))
     
-    def segment_to_segment_distance(self, p1, p2, p3, p4):
-        """Calculate minimum distance between two line segments"""
-        # Simplified implementation - minimum distance between segment endpoints and segments
-        d1 = self.point_to_segment_distance(p1, p3, p4)
-        d2 = self.point_to_segment_distance(p2, p3, p4)
-        d3 = self.point_to_segment_distance(p3, p1, p2)
-        d4 = self.point_to_segment_distance(p4, p1, p2)
-        
-        return min(d1, d2, d3, d4)
+    def any_vertex_within(self, points, segments, threshold_sq):
+        """Check if any point is closer than sqrt(threshold_sq) to any segment, stopping at the first hit"""
+        # Blocks of rows keep memory flat for long polylines instead of growing with n_points * n_segments
+        block_rows = max(1, self.INTERSECT_BLOCK_PAIRS // len(segments[0]))
+        for first_row in range(0, len(points), block_rows):
+            if point_segment_squared_distances(points[first_row:first_row + block_rows], *segments).min() < threshold_sq:
+                return True
+        return False
     
     def initialize_empty_topology(self):
         """Initialize empty topology structure for manual editing"""
@@ -429,37 +403,22 @@ class TopologyMode:
             self.clear_topology_labels()
             
             # Calculate label size based on mesh
-            mesh_size = np.linalg.norm(
-                np.array(self.viz.mesh.bounds[1::2]) - np.array(self.viz.mesh.bounds[::2])
-            )
-            label_height = mesh_size * 0.015
+            label_height = self.viz.mesh_size * self.LABEL_HEIGHT_FRACTION
             
-            for i, polyline_data in enumerate(self.viz.polylines):
-                if i not in self.topology_data:
-                    continue
-                
-                points = np.array(polyline_data['points'])
-                terminations = self.topology_data[i]['terminations']
-                
-                # Render start point label
-                self.render_endpoint_label(
-                    points[0], terminations[0], i, 0, label_height
-                )
-                
-                # Render end point label
-                self.render_endpoint_label(
-                    points[-1], terminations[1], i, 1, label_height
-                )
+            # One actor per termination type in use
+            termination_types = {termination_type for topology in self.topology_data.values()
+                                 for termination_type in topology['terminations']}
+            for termination_type in termination_types:
+                self.render_type_labels(termination_type, label_height)
             
             self.viz.plotter.render()
             
         except Exception as e:
             print(f"Error rendering topology labels: {e}")
-            import traceback
             traceback.print_exc()
     
-    def render_endpoint_label(self, position, termination_type, polyline_idx, endpoint_idx, height):
-        """Render a single endpoint label"""
+    def render_type_labels(self, termination_type, height):
+        """Render the labels of all endpoints with one termination type as a single glyph actor"""
         try:
             # Color mapping
             color_map = {
@@ -471,37 +430,41 @@ class TopologyMode:
             
             color = color_map.get(termination_type, 'gray')
             
-            # Create 3D text
-            text = pv.Text3D(termination_type, depth=height * 0.3)
-            text.points *= height
-            text.points += position
-            
-            actor_name = f'topology_label_{polyline_idx}_{endpoint_idx}'
+            # Endpoints currently labelled with this type
+            positions = [polyline_data['points'][0 if endpoint_idx == 0 else -1]
+                         for i, polyline_data in enumerate(self.viz.polylines) if i in self.topology_data
+                         for endpoint_idx, endpoint_type in enumerate(self.topology_data[i]['terminations'])
+                         if endpoint_type == termination_type]
+            if not positions:
+                self.viz.plotter.remove_actor(self.label_actors.pop(termination_type, None), render=False)
+                return
             
-            # Add with bold appearance (larger size)
-            self.viz.plotter.add_mesh(
-                text,
+            # 3D text tessellated once per letter and size, then stamped at every endpoint by the glyph filter
+            template = self.label_templates.get((termination_type, height))
+            if template is None:
+                template = pv.Text3D(termination_type, depth=height * 0.3)
+                template.points *= height
+                self.label_templates[(termination_type, height)] = template
+            labels = pv.PolyData(np.array(positions)).glyph(geom=template, scale=False, orient=False)
+            
+            # Add with bold appearance (larger size); the caller renders once for all labels
+            self.label_actors[termination_type] = self.viz.plotter.add_mesh(
+                labels,
                 color=color,
-                name=actor_name,
-                render_points_as_spheres=True
+                name=f'topology_labels_{termination_type}',
+                render_points_as_spheres=True,
+                render=False
             )
             
         except Exception as e:
-            print(f"Error rendering endpoint label: {e}")
+            print(f"Error rendering {termination_type} labels: {e}")
     
     def clear_topology_labels(self):
         """Clear all topology label actors"""
         try:
-            actors_to_remove = []
-            for name in list(self.viz.plotter.renderer.actors.keys()):
-                if name.startswith('topology_label_') or name.startswith('topology_highlight_'):
-                    actors_to_remove.append(name)
-            
-            for actor_name in actors_to_remove:
-                try:
-                    self.viz.plotter.remove_actor(actor_name)
-                except:
-                    pass
+            # Only the tracked label actors, no scan over every actor in the scene
+            self.viz.plotter.remove_actor(list(self.label_actors.values()), render=False)
+            self.label_actors = {}
         except Exception as e:
             print(f"Error clearing topology labels: {e}")
     
@@ -513,29 +476,16 @@ class TopologyMode:
             closest_polyline = None
             closest_endpoint = None
             
-            mesh_size = np.linalg.norm(
-                np.array(self.viz.mesh.bounds[1::2]) - np.array(self.viz.mesh.bounds[::2])
-            )
+            mesh_size = self.viz.mesh_size
             selection_threshold = mesh_size * 0.02  # 2% of mesh size
             
-            for i, polyline_data in enumerate(self.viz.polylines):
-                points = np.array(polyline_data['points'])
-                
-                # Check start point
-                dist_start = np.linalg.norm(np.array(surface_point) - points[0])
-                if dist_start < min_distance:
-                    min_distance = dist_start
-                    closest_polyline = i
-                    closest_endpoint = 0
-                
-                # Check end point
-                dist_end = np.linalg.norm(np.array(surface_point) - points[-1])
-                if dist_end < min_distance:
-                    min_distance = dist_end
-                    closest_polyline = i
-                    closest_endpoint = 1
+            # Squared distances to the start (column 0) and end (column 1) of every polyline in one pass
+            endpoint_distances_sq = squared_distances(self.viz.get_endpoints(), np.asarray(surface_point))
+            if endpoint_distances_sq.size:
+                closest_polyline, closest_endpoint = (int(i) for i in np.unravel_index(endpoint_distances_sq.argmin(), endpoint_distances_sq.shape))
+                min_distance = np.sqrt(endpoint_distances_sq[closest_polyline, closest_endpoint])
             
-            print(f"Closest endpoint: polyline {closest_polyline}, endpoint {closest_endpoint}, distance: {min_distance:.6f}")
+            logger.debug("Closest endpoint: polyline %s, endpoint %s, distance: %.6f", closest_polyline, closest_endpoint, min_distance)
             
             if min_distance < selection_threshold:
                 # Check if clicking on already selected endpoint
@@ -553,7 +503,6 @@ class TopologyMode:
                 
         except Exception as e:
             print(f"Error in topology pick: {e}")
-            import traceback
             traceback.print_exc()
     
     def select_endpoint(self, polyline_idx, endpoint_idx):
@@ -562,12 +511,10 @@ class TopologyMode:
             self.selected_endpoint = (polyline_idx, endpoint_idx)
             
             # Highlight selected endpoint
-            points = np.array(self.viz.polylines[polyline_idx]['points'])
+            points = self.viz.polylines[polyline_idx]['points']
             endpoint_pos = points[0] if endpoint_idx == 0 else points[-1]
             
-            mesh_size = np.linalg.norm(
-                np.array(self.viz.mesh.bounds[1::2]) - np.array(self.viz.mesh.bounds[::2])
-            )
+            mesh_size = self.viz.mesh_size
             sphere_radius = mesh_size * 0.005
             
             sphere = pv.Sphere(radius=sphere_radius, center=endpoint_pos)
@@ -586,13 +533,10 @@ class TopologyMode:
         except Exception as e:
             print(f"Error selecting endpoint: {e}")
     
-    def deselect_endpoint(self):
+    def deselect_endpoint(self, render=True):
         """Deselect current endpoint"""
         if self.selected_endpoint:
-            try:
-                self.viz.plotter.remove_actor('topology_highlight')
-            except:
-                pass
+            self.viz.plotter.remove_actor('topology_highlight', render=render)
             
             print("Endpoint deselected")
             self.selected_endpoint = None
@@ -607,18 +551,21 @@ class TopologyMode:
             polyline_idx, endpoint_idx = self.selected_endpoint
             
             # Update topology data
+            previous_type = self.topology_data[polyline_idx]['terminations'][endpoint_idx]
             self.topology_data[polyline_idx]['terminations'][endpoint_idx] = termination_type
             
             type_names = {'B': 'Blind', 'X': 'Crossing', 'A': 'Abutting', 'C': 'Censored'}
             print(f"Updated polyline {polyline_idx + 1} endpoint {endpoint_idx + 1} to {type_names[termination_type]}")
             
-            # Re-render labels
-            self.render_topology_labels()
+            # Rebuild only the label actors of the type the endpoint left and the type it joined
+            label_height = self.viz.mesh_size * self.LABEL_HEIGHT_FRACTION
+            for changed_type in {previous_type, termination_type}:
+                self.render_type_labels(changed_type, label_height)
             
-            # Deselect after update
-            self.deselect_endpoint()
+            # Deselect after update, rendering once for both changes
+            self.deselect_endpoint(render=False)
+            self.viz.plotter.render()
             
         except Exception as e:
             print(f"Error updating endpoint: {e}")
-            import traceback
             traceback.print_exc()
\ No newline at end of file